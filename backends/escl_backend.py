@@ -1,56 +1,175 @@
+import logging
+import shutil
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Read/write block size for image downloads
+CHUNK_SIZE = 1 << 19  # 512 KiB
+
+# JPEG doesn't compress, so ask for the body as-is; that also keeps byte
+# offsets valid for resuming with a Range request
+DOWNLOAD_HEADERS = {"Accept-Encoding": "identity"}
+DOWNLOAD_RETRIES = 3
+BACKOFF_FACTOR = 0.3
+_RESUMABLE_ERRORS = (requests.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                     ProtocolError, ReadTimeoutError)
+
+# Shared session so repeated scans to the same printer reuse TCP connections
+_SESSION = requests.Session()
+_SESSION.headers["Connection"] = "keep-alive"
+_ADAPTER = HTTPAdapter(pool_connections=16, pool_maxsize=32,
+                       max_retries=Retry(total=DOWNLOAD_RETRIES, backoff_factor=BACKOFF_FACTOR))
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+# eSCL scan job request: A4 platen, colour JPEG. Built once as bytes; only the
+# resolution is filled in per scan.
+SCAN_SETTINGS_TEMPLATE = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b'<scan:ScanSettings xmlns:scan="http://schemas.hp.com/imaging/escl/2011/05/03"'
+    b' xmlns:pwg="http://www.pwg.org/schemas/2010/12/sm">'
+    b'<pwg:Version>2.0</pwg:Version>'
+    b'<scan:Intent>Document</scan:Intent>'
+    b'<scan:InputSource>Platen</scan:InputSource>'
+    b'<pwg:ScanRegions>'
+    b'<pwg:ScanRegion>'
+    b'<pwg:Height>3508</pwg:Height>'
+    b'<pwg:Width>2480</pwg:Width>'
+    b'<pwg:XOffset>0</pwg:XOffset>'
+    b'<pwg:YOffset>0</pwg:YOffset>'
+    b'</pwg:ScanRegion>'
+    b'</pwg:ScanRegions>'
+    b'<pwg:InputAttributes>'
+    b'<pwg:MinimumSize>'
+    b'<pwg:Width>2480</pwg:Width>'
+    b'<pwg:Height>3508</pwg:Height>'
+    b'</pwg:MinimumSize>'
+    b'</pwg:InputAttributes>'
+    b'<scan:DocumentFormatExt>image/jpeg</scan:DocumentFormatExt>'
+    b'<scan:XResolution>%d</scan:XResolution>'
+    b'<scan:YResolution>%d</scan:YResolution>'
+    b'<scan:ColorMode>RGB24</scan:ColorMode>'
+    b'</scan:ScanSettings>'
+)
+SCAN_SETTINGS_HEADERS = {"Content-Type": "application/xml; charset=utf-8"}
+DEFAULT_RESOLUTION = 300
+_DEFAULT_SCAN_SETTINGS = SCAN_SETTINGS_TEMPLATE % (DEFAULT_RESOLUTION, DEFAULT_RESOLUTION)
 
-def scan_from_escl(url, output_file="scan.jpg"):
+
+def scan_settings(resolution=DEFAULT_RESOLUTION):
+    """Return the encoded ScanSettings body for the given DPI"""
+    if resolution == DEFAULT_RESOLUTION:
+        return _DEFAULT_SCAN_SETTINGS
+    return SCAN_SETTINGS_TEMPLATE % (resolution, resolution)
+
+
+def _copy_body(resp, f):
     """
-    Scan from any eSCL/AirScan printer (HP, Canon, Epson, Brother)
-    Example URL: http://192.168.1.100:8080/eSCL
+    Copy a streamed response body into an open file in CHUNK_SIZE blocks.
+    os.sendfile can't read from a socket on Linux, and urllib3 may already hold
+    the start of the body in its own buffer, so the copy goes through resp.raw
+    rather than the socket fd.
+    """
+    resp.raw.decode_content = True
+    shutil.copyfileobj(resp.raw, f, length=CHUNK_SIZE)
+
+
+# Resume policy, shared with the aiohttp backend
+
+def download_headers(offset=0, resumable=False):
+    """Headers for fetching the image, asking only for the missing tail when resuming"""
+    headers = dict(DOWNLOAD_HEADERS)
+    if resumable and offset:
+        headers["Range"] = f"bytes={offset}-"
+    return headers
+
+
+def is_resumable(headers):
+    """Offsets only line up with the file when nothing was decoded"""
+    return "Content-Encoding" not in headers
+
+
+def retry_delay(attempt):
+    return BACKOFF_FACTOR * (2 ** attempt)
+
+
+def _download(url, output_file):
     """
+    Stream url into output_file. If the connection drops partway through, ask
+    for the rest with a Range request and append, rather than starting again.
+    """
+    with open(output_file, "wb") as f:
+        resumable = False
+        for attempt in range(DOWNLOAD_RETRIES + 1):
+            headers = download_headers(f.tell(), resumable)
+
+            try:
+                # Closing the response hands the connection back to the pool
+                with _SESSION.get(url, stream=True, timeout=30, headers=headers) as resp:
+                    resp.raise_for_status()
+                    if resp.status_code != 206:
+                        # Full body (first try, or the server ignored Range)
+                        f.seek(0)
+                        f.truncate()
+                    resumable = is_resumable(resp.headers)
+                    _copy_body(resp, f)
+                return
+            except _RESUMABLE_ERRORS:
+                if attempt == DOWNLOAD_RETRIES:
+                    raise
+                time.sleep(retry_delay(attempt))
+
+
+def _start_job(url, resolution):
+    """Create a scan job and return its URL"""
     if not url.endswith("/eSCL"):
         url = url.rstrip("/") + "/eSCL"
 
-    scan_req = """<?xml version="1.0" encoding="UTF-8"?>
-    <scan:ScanSettings xmlns:scan="http://schemas.hp.com/imaging/escl/2011/05/03"
-                       xmlns:pwg="http://www.pwg.org/schemas/2010/12/sm">
-      <pwg:Version>2.0</pwg:Version>
-      <scan:Intent>Document</scan:Intent>
-      <scan:InputSource>Platen</scan:InputSource>
-      <pwg:ScanRegions>
-        <pwg:ScanRegion>
-          <pwg:Height>3508</pwg:Height>
-          <pwg:Width>2480</pwg:Width>
-          <pwg:XOffset>0</pwg:XOffset>
-          <pwg:YOffset>0</pwg:YOffset>
-        </pwg:ScanRegion>
-      </pwg:ScanRegions>
-      <pwg:InputAttributes>
-        <pwg:MinimumSize>
-          <pwg:Width>2480</pwg:Width>
-          <pwg:Height>3508</pwg:Height>
-        </pwg:MinimumSize>
-      </pwg:InputAttributes>
-      <scan:DocumentFormatExt>image/jpeg</scan:DocumentFormatExt>
-      <scan:XResolution>300</scan:XResolution>
-      <scan:YResolution>300</scan:YResolution>
-      <scan:ColorMode>RGB24</scan:ColorMode>
-    </scan:ScanSettings>"""
+    r = _SESSION.post(f"{url}/ScanJobs", data=scan_settings(resolution),
+                      headers=SCAN_SETTINGS_HEADERS, timeout=10)
+    r.raise_for_status()
+    return r.headers["Location"]
+
 
+def scan_from_escl(url, output_file="scan.jpg", resolution=DEFAULT_RESOLUTION):
+    """
+    Scan from any eSCL/AirScan printer (HP, Canon, Epson, Brother)
+    Example URL: http://192.168.1.100:8080/eSCL
+    """
     try:
         # Start scan job
-        headers = {"Content-Type": "application/xml"}
-        r = requests.post(f"{url}/ScanJobs", data=scan_req, headers=headers, timeout=10)
-        r.raise_for_status()
-        job_url = r.headers["Location"]
+        job_url = _start_job(url, resolution)
 
         # Get image
-        resp = requests.get(f"{job_url}/NextDocument", stream=True, timeout=30)
-        resp.raise_for_status()
+        _download(f"{job_url}/NextDocument", output_file)
 
-        with open(output_file, "wb") as f:
-            for chunk in resp.iter_content(1024):
-                f.write(chunk)
-
-        print(f"eSCL scan saved: {output_file}")
+        logger.info(f"eSCL scan saved: {output_file}")
         return output_file
 
     except Exception as e:
-        raise RuntimeError(f"eSCL scan failed: {e}")
\ No newline at end of file
+        raise RuntimeError(f"eSCL scan failed: {e}")
+
+
+def stream_from_escl(url, resolution=DEFAULT_RESOLUTION):
+    """
+    Start an eSCL scan and return (content_type, chunks), where chunks yields
+    the image as it arrives from the printer instead of saving it first
+    """
+    try:
+        job_url = _start_job(url, resolution)
+        resp = _SESSION.get(f"{job_url}/NextDocument", stream=True, timeout=30, headers=DOWNLOAD_HEADERS)
+        resp.raise_for_status()
+    except Exception as e:
+        raise RuntimeError(f"eSCL scan failed: {e}")
+
+    def chunks():
+        with resp:
+            yield from resp.iter_content(CHUNK_SIZE)
+
+    return resp.headers.get("Content-Type", "image/jpeg"), chunks()
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+
+import aiofiles
+import aiohttp
+
+from backends.escl_backend import (CHUNK_SIZE, DEFAULT_RESOLUTION, DOWNLOAD_RETRIES, SCAN_SETTINGS_HEADERS,
+                                   download_headers, is_resumable, retry_delay, scan_settings)
+
+logger = logging.getLogger(__name__)
+
+_RESUMABLE_ERRORS = (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+
+async def _download_async(session, url, output_file):
+    """asyncio version of _download, resuming with a Range request after a dropped connection"""
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
+    async with aiofiles.open(output_file, "wb") as f:
+        resumable = False
+        for attempt in range(DOWNLOAD_RETRIES + 1):
+            headers = download_headers(await f.tell(), resumable)
+
+            try:
+                async with session.get(url, headers=headers, timeout=timeout) as resp:
+                    resp.raise_for_status()
+                    if resp.status != 206:
+                        # Full body (first try, or the server ignored Range)
+                        await f.seek(0)
+                        await f.truncate()
+                    resumable = is_resumable(resp.headers)
+                    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                        await f.write(chunk)
+                return
+            except _RESUMABLE_ERRORS:
+                if attempt == DOWNLOAD_RETRIES:
+                    raise
+                await asyncio.sleep(retry_delay(attempt))
+
+
+async def scan_from_escl_async(session, url, output_file="scan.jpg", resolution=DEFAULT_RESOLUTION):
+    """
+    asyncio version of scan_from_escl, sharing one aiohttp session
+    so concurrent network scans reuse connections on a single event loop
+    """
+    if not url.endswith("/eSCL"):
+        url = url.rstrip("/") + "/eSCL"
+
+    try:
+        # Start scan job
+        async with session.post(f"{url}/ScanJobs", data=scan_settings(resolution), headers=SCAN_SETTINGS_HEADERS,
+                                timeout=aiohttp.ClientTimeout(total=10)) as r:
+            r.raise_for_status()
+            job_url = r.headers["Location"]
+
+        # Get image
+        await _download_async(session, f"{job_url}/NextDocument", output_file)
+
+        logger.info(f"eSCL scan saved: {output_file}")
+        return output_file
+
+    except Exception as e:
+        raise RuntimeError(f"eSCL scan failed: {e}")
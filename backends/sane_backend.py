@@ -7,12 +7,10 @@ class SaneBackend:
     def list_scanners(self):
         return sane.get_devices()
 
-    def scan(self, scanner_id, output_file="scan.png"):
-        devices = sane.get_devices()
-        if not devices:
-            raise RuntimeError("No scanners found")
-        dev_name = devices[scanner_id][0]
-        scanner = sane.open(dev_name)
+    def scan(self, device_id, output_file="scan.png"):
+        # Open by device name rather than position, so a rescan that adds or
+        # reorders devices can't point us at the wrong scanner
+        scanner = sane.open(device_id)
         scanner.mode = 'color'
         scanner.resolution = 300
         image = scanner.scan()
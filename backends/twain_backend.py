@@ -7,8 +7,8 @@ class TwainBackend:
     def list_scanners(self):
         return self.sm.source_list
 
-    def scan(self, scanner_id=0, output_file="scan.bmp"):
-        src = self.sm.open_source()
+    def scan(self, device_id=None, output_file="scan.bmp"):
+        src = self.sm.open_source(device_id)
         src.request_acquire(0, 0)
         (info, img) = src.xfer_image_natively()
         twain.dib_to_bm_file(img, output_file)
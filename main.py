@@ -1,36 +1,119 @@
+import asyncio
+import atexit
+import contextlib
 import datetime
+import heapq
 import threading
 import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
 import os
 import sys
 import logging
+import logging.handlers
+import queue
+import re
+import shutil
 import warnings
 
+PORT = int(os.getenv("PORT", 5000))
+# One process keeps available_scanners/scan_status shared; threads give concurrency
+WEB_THREADS = int(os.getenv("WEB_THREADS", "16"))
+
+# `python main.py` on Linux/macOS hands over to gunicorn, which imports this
+# module itself via wsgi.py. Exec before any module-level setup (SANE init,
+# detection, worker threads) so that work only happens once, in gunicorn.
+if __name__ == '__main__' and not os.getenv("FLASK_DEV") and sys.platform != "win32":
+    gunicorn = shutil.which("gunicorn")
+    if gunicorn is None:
+        sys.exit("gunicorn not found on PATH: install it (pip install gunicorn) or set FLASK_DEV=1")
+    print(f"Serving with gunicorn on port {PORT}", flush=True)
+    os.execv(gunicorn, ["gunicorn", "-w", "1", "--threads", str(WEB_THREADS),
+                        "-b", f"0.0.0.0:{PORT}", "wsgi:app"])
+
 from scanner_manager import ScannerManager
 
+# Log through a queue so scan and detection threads never block on stdout;
+# a single listener thread does the writing. stdout rather than stderr, since
+# fd 2 is pointed at /dev/null while SANE probes for devices.
+_log_queue = queue.Queue(-1)
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s",
+                    handlers=[logging.handlers.QueueHandler(_log_queue)])
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler(sys.stdout))
+_log_listener.start()
+atexit.register(_log_listener.stop)
+logger = logging.getLogger(__name__)
+
 # Suppress BJNP network discovery warnings (they're harmless)
 warnings.filterwarnings("ignore", message=".*bjnp.*")
 warnings.filterwarnings("ignore", message=".*bind socket.*")
 
+# The async eSCL path also needs aiofiles, which the backend module imports
+try:
+    import aiohttp
+    import backends.escl_backend_async  # noqa: F401
+except ImportError:
+    aiohttp = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@contextlib.contextmanager
+def silence_fd(fd=2):
+    """Point a file descriptor at /dev/null for the duration of the block.
+
+    SANE prints its BJNP warnings from C straight to fd 2, so swapping
+    sys.stderr doesn't hide them.
+    """
+    sys.stderr.flush()
+    saved = os.dup(fd)
+    null = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(null, fd)
+    try:
+        yield
+    finally:
+        os.dup2(saved, fd)
+        os.close(saved)
+        os.close(null)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Encode responses with orjson when it's installed, stdlib json otherwise.
+
+    Datetimes come out as ISO 8601 either way.
+    """
 
-# Redirect scanner backend warnings to null (optional)
-class DevNull:
-    def write(self, msg): pass
+    @staticmethod
+    def default(o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
 
-    def flush(self): pass
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default).decode()
 
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
 
-# Temporarily redirect stderr during scanner operations to reduce noise
-original_stderr = sys.stderr
 
 app = Flask(__name__)
+app.json = JSONProvider(app)
 
 # Configuration
 UPLOAD_FOLDER = 'scans'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+_ALLOWED = tuple(f'.{ext}' for ext in ALLOWED_EXTENSIONS)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
 # Ensure upload folder exists
@@ -40,23 +123,75 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 sm = ScannerManager()
 
 # Store scan status for async operations
-scan_status = {}
+# Bounded LRU: once _SS_MAX is reached the least recently touched scan is
+# dropped. Go through the _*_scan_status helpers, which hold _SS_LOCK.
+scan_status = OrderedDict()
+_SS_LOCK = threading.Lock()
+_SS_MAX = 1024
+scan_futures = {}
+# Set whenever a scan's status changes, to wake /api/scan/stream listeners
+scan_events = {}
+SCAN_STREAM_KEEPALIVE = 5.0
+
+# Worker pools: SANE/TWAIN are not thread-safe and the hardware is serial, so
+# local scans (and device detection) share a single worker. eSCL scans are
+# plain HTTP and get their own pool so they never queue behind a stuck device.
+HW_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hw-scan")
+NET_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("ESCL_WORKERS", "8")), thread_name_prefix="net-scan")
+
+
+async def _create_escl_session():
+    return aiohttp.ClientSession()
+
+
+def _close_escl_session():
+    """Close the shared session on its own loop, then stop the loop"""
+    try:
+        asyncio.run_coroutine_threadsafe(escl_session.close(), escl_loop).result(timeout=5)
+    finally:
+        escl_loop.call_soon_threadsafe(escl_loop.stop)
+
+
+# When aiohttp is available, eSCL scans run as coroutines on one event loop
+# thread with a shared session; otherwise they fall back to NET_POOL
+escl_loop = None
+escl_session = None
+if aiohttp is not None:
+    escl_loop = asyncio.new_event_loop()
+    threading.Thread(target=escl_loop.run_forever, daemon=True, name="escl-loop").start()
+    escl_session = asyncio.run_coroutine_threadsafe(_create_escl_session(), escl_loop).result()
+    atexit.register(_close_escl_session)
+
+# Scanner type detection, checked in order against the lower-cased device ID
+_NET = re.compile(r'airscan|escl|net|wifi|ip=')  # 'net' also covers 'network' and hpaio:/net/
+_USB = re.compile(r'hpaio|usb|direct|local')
+_BRAND = re.compile(r'hp|canon|epson|brother|samsung')
+_SCANNER_TYPES = (
+    (_NET, 'Network', 'WiFi/Network'),
+    (_USB, 'USB/Direct', 'USB or Direct Connection'),
+    (_BRAND, 'USB', 'USB Cable'),
+)
+_IP_RE = re.compile(r'ip=([^&]+)')
 
 # Global variables for scanner management
-available_scanners = []
+# scanner_id -> scanner info; rebuilt by detection and swapped in whole under the lock
+available_scanners = {}
+_scanners_lock = threading.Lock()
 scanner_detection_status = "initializing"
 last_scan_detection = None
+# Unprocessed list from the last detection run, for /api/debug/scanners
+_last_raw_scanners = []
 
 
 # Auto-detect scanners on startup
 def auto_detect_scanners():
     """Automatically detect all available scanners (USB and wireless)"""
-    global available_scanners, scanner_detection_status, last_scan_detection
+    global available_scanners, scanner_detection_status, last_scan_detection, _last_raw_scanners
 
     try:
         scanner_detection_status = "detecting"
-        print("🔍 Auto-detecting scanners...")
-        print("⚠️  Note: BJNP network discovery warnings are normal and can be ignored")
+        logger.info("🔍 Auto-detecting scanners...")
+        logger.info("⚠️  Note: BJNP network discovery warnings are normal and can be ignored")
 
         # Add a small delay to avoid conflicts
         time.sleep(1)
@@ -64,24 +199,21 @@ def auto_detect_scanners():
         # Get all available scanners with error suppression
         try:
             # Temporarily suppress stderr to hide BJNP warnings
-            sys.stderr = DevNull()
-            scanners = sm.list_scanners()
-            sys.stderr = original_stderr
+            with silence_fd():
+                scanners = sm.list_scanners()
         except Exception as scanner_error:
-            sys.stderr = original_stderr
-            print(f"⚠️  Scanner detection warning (continuing): {scanner_error}")
+            logger.warning(f"⚠️  Scanner detection warning (continuing): {scanner_error}")
             # Try again with a delay
             time.sleep(2)
             try:
-                sys.stderr = DevNull()
-                scanners = sm.list_scanners()
-                sys.stderr = original_stderr
+                with silence_fd():
+                    scanners = sm.list_scanners()
             except Exception as retry_error:
-                sys.stderr = original_stderr
-                print(f"❌ Scanner detection failed on retry: {retry_error}")
+                logger.error(f"❌ Scanner detection failed on retry: {retry_error}")
                 scanners = []
 
-        available_scanners = []
+        _last_raw_scanners = scanners
+        new_map = {}
 
         for i, scanner in enumerate(scanners):
             # Handle different scanner data types (string, tuple, list)
@@ -124,7 +256,13 @@ def auto_detect_scanners():
                 # Extract clean name from brackets like "HP Deskjet 4640 series [A95CBB]"
                 display_name = display_name.split('[')[0].strip()
 
+            # Stable across rescans as long as the device ID doesn't change
+            scanner_id = str(uuid.uuid5(uuid.NAMESPACE_URL, scanner_device_id))
+            if scanner_id in new_map:
+                scanner_id = str(uuid.uuid4())
+
             scanner_info = {
+                'scanner_id': scanner_id,
                 'index': i,
                 'name': display_name,
                 'device_id': scanner_device_id,
@@ -141,60 +279,68 @@ def auto_detect_scanners():
             # Enhanced scanner type detection
             device_lower = scanner_device_id.lower()
 
-            # Network/Wireless detection
-            if any(term in device_lower for term in ['airscan', 'escl', 'network', 'net', 'wifi', 'ip=']):
-                scanner_info['type'] = 'Network'
-                scanner_info['connection'] = 'WiFi/Network'
-                if 'ip=' in connection_info:
-                    ip = connection_info.split('ip=')[1].split('&')[0] if 'ip=' in connection_info else ''
-                    if ip:
-                        scanner_info['connection'] = f'Network ({ip})'
-            # USB/Direct detection
-            elif any(term in device_lower for term in ['hpaio', 'usb', 'direct', 'local']):
-                scanner_info['type'] = 'USB/Direct'
-                scanner_info['connection'] = 'USB or Direct Connection'
-            # Brand-based detection
-            elif any(brand in device_lower for brand in ['hp', 'canon', 'epson', 'brother', 'samsung']):
-                scanner_info['type'] = 'USB'
-                scanner_info['connection'] = 'USB Cable'
-
-            available_scanners.append(scanner_info)
+            # Network/Wireless, then USB/Direct, then brand-based detection
+            for pattern, scanner_type, connection in _SCANNER_TYPES:
+                if pattern.search(device_lower):
+                    scanner_info['type'] = scanner_type
+                    scanner_info['connection'] = connection
+                    break
+
+            if scanner_info['type'] == 'Network':
+                ip_match = _IP_RE.search(connection_info)
+                if ip_match:
+                    scanner_info['connection'] = f'Network ({ip_match.group(1)})'
+
+            new_map[scanner_id] = scanner_info
 
             # Debug print to understand the data structure
-            print(f"   ✅ Processed Scanner {i}: {display_name}")
-            print(f"      Device ID: {scanner_device_id}")
-            print(f"      Type: {scanner_info['type']} ({scanner_info['connection']})")
+            logger.info(f"   ✅ Processed Scanner {i}: {display_name}")
+            logger.info(f"      Device ID: {scanner_device_id}")
+            logger.info(f"      Type: {scanner_info['type']} ({scanner_info['connection']})")
+
+        with _scanners_lock:
+            available_scanners = new_map
 
         scanner_detection_status = "completed"
         last_scan_detection = datetime.datetime.now()  # FIXED: Use datetime.now() instead of datetime.time
 
-        print(f"✅ Detection completed! Found {len(available_scanners)} scanner(s):")
-        for scanner in available_scanners:
-            print(f"   - {scanner['name']} ({scanner['type']})")
+        logger.info(f"✅ Detection completed! Found {len(available_scanners)} scanner(s):")
+        for scanner in new_map.values():
+            logger.info(f"   - {scanner['name']} ({scanner['type']})")
             if scanner['connection_info']:
-                print(f"     Connection: {scanner['connection']}")
+                logger.info(f"     Connection: {scanner['connection']}")
 
-        if len(available_scanners) == 0:
-            print("ℹ️  No scanners found. Make sure:")
-            print("   - USB scanners are connected and powered on")
-            print("   - Network scanners are on the same network")
-            print("   - Scanner drivers are properly installed")
+        if len(new_map) == 0:
+            logger.info("ℹ️  No scanners found. Make sure:")
+            logger.info("   - USB scanners are connected and powered on")
+            logger.info("   - Network scanners are on the same network")
+            logger.info("   - Scanner drivers are properly installed")
 
     except Exception as e:
         scanner_detection_status = "error"
-        print(f"❌ Scanner detection failed: {e}")
-        logging.error(f"Scanner detection error: {e}")
-        available_scanners = []
+        logger.error(f"❌ Scanner detection failed: {e}")
+        with _scanners_lock:
+            available_scanners = {}
+
+
+_detection_started = False
+_detection_start_lock = threading.Lock()
 
 
 def start_scanner_detection():
-    """Start scanner detection with proper error handling"""
+    """Start scanner detection with proper error handling (once per process)"""
+    global _detection_started
+
+    with _detection_start_lock:
+        if _detection_started:
+            return
+        _detection_started = True
+
     try:
-        detection_thread = threading.Thread(target=auto_detect_scanners, daemon=True)
-        detection_thread.start()
-        print("📡 Scanner auto-detection started in background...")
+        HW_POOL.submit(auto_detect_scanners)
+        logger.info("📡 Scanner auto-detection started in background...")
     except Exception as e:
-        print(f"❌ Failed to start scanner detection: {e}")
+        logger.error(f"❌ Failed to start scanner detection: {e}")
 
 
 # Start auto-detection in background thread on startup
@@ -212,12 +358,15 @@ def get_scanners():
     """Get list of available scanners with detailed information"""
     global available_scanners, scanner_detection_status, last_scan_detection
 
+    with _scanners_lock:
+        scanners = list(available_scanners.values())
+
     return jsonify({
         'success': True,
-        'scanners': available_scanners,
+        'scanners': scanners,
         'detection_status': scanner_detection_status,
-        'last_detection': last_scan_detection.isoformat() if last_scan_detection else None,
-        'total_count': len(available_scanners)
+        'last_detection': last_scan_detection,
+        'total_count': len(scanners)
     })
 
 
@@ -229,13 +378,15 @@ def refresh_scanners():
         global scanner_detection_status
         scanner_detection_status = "detecting"
 
+        # Force a fresh device probe instead of the cached list
+        sm.invalidate()
+
         # Start detection in background thread with delay
         def delayed_detection():
             time.sleep(1)  # Small delay to avoid conflicts
             auto_detect_scanners()
 
-        detection_thread = threading.Thread(target=delayed_detection, daemon=True)
-        detection_thread.start()
+        HW_POOL.submit(delayed_detection)
 
         return jsonify({
             'success': True,
@@ -248,18 +399,48 @@ def refresh_scanners():
         }), 500
 
 
+DEBUG_PROBE_TIMEOUT = 30.0
+
+
+def _probe_raw_scanners():
+    """Re-probe devices for the debug route and remember the result"""
+    global _last_raw_scanners
+
+    sm.invalidate()
+    with silence_fd():
+        scanners = sm.list_scanners()
+    _last_raw_scanners = scanners
+    return scanners
+
+
 @app.route('/api/debug/scanners', methods=['GET'])
 def debug_scanners():
-    """Debug route to see raw scanner data"""
+    """Debug route to see raw scanner data (?force=1 re-probes devices)"""
     try:
-        # Get raw scanner data
-        raw_scanners = sm.list_scanners()
+        # Get raw scanner data from the last detection; only probe on request,
+        # and then on the hardware pool so SANE isn't entered concurrently
+        forced = request.args.get('force') == '1'
+        if forced:
+            try:
+                raw_scanners = HW_POOL.submit(_probe_raw_scanners).result(timeout=DEBUG_PROBE_TIMEOUT)
+            except FutureTimeoutError:
+                return jsonify({
+                    'success': False,
+                    'error': 'Scanner probe timed out (a scan or detection may be holding the hardware)'
+                }), 504
+        else:
+            raw_scanners = _last_raw_scanners
+
+        with _scanners_lock:
+            processed_scanners = list(available_scanners.values())
 
         debug_info = {
             'raw_scanners': raw_scanners,
             'scanner_count': len(raw_scanners) if raw_scanners else 0,
             'scanner_types': [type(scanner).__name__ for scanner in raw_scanners] if raw_scanners else [],
-            'processed_scanners': available_scanners
+            'processed_scanners': processed_scanners,
+            # A forced probe isn't parsed, so processed_scanners may be older
+            'raw_matches_processed': not forced
         }
 
         # Try to understand each scanner's structure
@@ -332,25 +513,36 @@ def start_scan():
     """Start scanning process from selected scanner"""
     try:
         data = request.get_json()
+        scanner_id = data.get('scanner_id')
         scanner_index = data.get('scanner_index')
         format_type = data.get('format', 'png')
 
-        if scanner_index is None:
+        if scanner_id is None and scanner_index is None:
             return jsonify({
                 'success': False,
-                'error': 'Scanner index is required'
+                'error': 'Scanner ID is required'
             }), 400
 
-        # Validate scanner index
-        if scanner_index >= len(available_scanners) or scanner_index < 0:
+        # Look up scanner info (scanner_index kept for older clients)
+        with _scanners_lock:
+            if scanner_id is not None:
+                selected_scanner = available_scanners.get(scanner_id)
+            else:
+                selected_scanner = next(
+                    (info for info in available_scanners.values() if info['index'] == scanner_index), None
+                )
+
+            if selected_scanner is not None:
+                # Update scanner last used
+                selected_scanner['last_used'] = datetime.datetime.now()  # FIXED: Use datetime.now()
+                selected_scanner = dict(selected_scanner)
+
+        if selected_scanner is None:
             return jsonify({
                 'success': False,
-                'error': 'Invalid scanner index'
+                'error': 'Invalid scanner ID'
             }), 400
 
-        # Get scanner info
-        selected_scanner = available_scanners[scanner_index]
-
         # Generate unique filename
         scan_id = str(uuid.uuid4())
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")  # FIXED: Use datetime.now()
@@ -359,24 +551,17 @@ def start_scan():
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
 
         # Initialize scan status
-        scan_status[scan_id] = {
+        _add_scan_status(scan_id, {
             'status': 'scanning',
             'progress': 0,
             'filename': None,
             'error': None,
             'scanner_name': selected_scanner['name'],
             'scanner_type': selected_scanner['type']
-        }
-
-        # Update scanner last used
-        available_scanners[scanner_index]['last_used'] = datetime.datetime.now().isoformat()  # FIXED: Use datetime.now()
+        })
 
-        # Start scan in background thread
-        thread = threading.Thread(
-            target=perform_scan,
-            args=(scan_id, scanner_index, filepath)
-        )
-        thread.start()
+        # Queue scan on the hardware pool
+        scan_futures[scan_id] = HW_POOL.submit(perform_scan, scan_id, selected_scanner, filepath)
 
         return jsonify({
             'success': True,
@@ -413,19 +598,20 @@ def start_network_scan():
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
 
         # Initialize scan status
-        scan_status[scan_id] = {
+        _add_scan_status(scan_id, {
             'status': 'scanning',
             'progress': 0,
             'filename': None,
             'error': None
-        }
+        })
 
-        # Start network scan in background thread
-        thread = threading.Thread(
-            target=perform_network_scan,
-            args=(scan_id, escl_url, filepath)
-        )
-        thread.start()
+        # Queue network scan on the event loop, or the eSCL pool without aiohttp
+        if escl_loop is not None:
+            scan_futures[scan_id] = asyncio.run_coroutine_threadsafe(
+                perform_network_scan_async(scan_id, escl_url, filepath), escl_loop
+            )
+        else:
+            scan_futures[scan_id] = NET_POOL.submit(perform_network_scan, scan_id, escl_url, filepath)
 
         return jsonify({
             'success': True,
@@ -440,10 +626,94 @@ def start_network_scan():
         }), 500
 
 
+@app.route('/api/scan/network/stream', methods=['GET'])
+def stream_network_scan():
+    """Scan from an eSCL scanner and send the image straight to the client (?save=1 also keeps a copy)"""
+    escl_url = request.args.get('escl_url')
+    if not escl_url:
+        return jsonify({
+            'success': False,
+            'error': 'eSCL URL is required'
+        }), 400
+
+    try:
+        content_type, chunks = sm.stream_network_escl(escl_url)
+    except Exception as e:
+        logger.error(f"❌ Network scan failed: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 502
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"network_scan_{timestamp}_{uuid.uuid4()}.jpg"
+    if request.args.get('save') == '1':
+        chunks = _tee_to_file(chunks, os.path.join(app.config['UPLOAD_FOLDER'], filename))
+
+    return Response(chunks, mimetype=content_type,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
+_TEE_DONE = object()
+_TEE_ABORTED = object()
+
+
+def _tee_to_file(chunks, filepath):
+    """
+    Pass chunks through while a background thread writes them to filepath.
+    If saving fails, the client still gets the whole scan; only the copy is lost.
+    """
+    q = queue.Queue(maxsize=16)
+    writer_failed = threading.Event()
+
+    def writer():
+        saved = False
+        try:
+            with open(filepath, 'wb') as f:
+                while True:
+                    chunk = q.get()
+                    if chunk is _TEE_DONE:
+                        saved = True
+                        return
+                    if chunk is _TEE_ABORTED:
+                        return
+                    f.write(chunk)
+        except Exception as e:
+            logger.error(f"❌ Failed to save streamed scan {filepath}: {e}")
+        finally:
+            if not saved:
+                writer_failed.set()
+                # Don't leave a truncated scan behind if the transfer didn't finish
+                with contextlib.suppress(OSError):
+                    os.remove(filepath)
+
+    def put(item):
+        # Never block forever on a writer that has died
+        while not writer_failed.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    threading.Thread(target=writer, daemon=True, name="scan-tee").start()
+    completed = False
+    try:
+        for chunk in chunks:
+            put(chunk)
+            yield chunk
+        completed = True
+    finally:
+        put(_TEE_DONE if completed else _TEE_ABORTED)
+
+
 @app.route('/api/scan/status/<scan_id>', methods=['GET'])
 def get_scan_status(scan_id):
     """Get status of a scan operation"""
-    if scan_id not in scan_status:
+    _check_scan_future(scan_id)
+    status = _get_scan_status(scan_id)
+
+    if status is None:
         return jsonify({
             'success': False,
             'error': 'Scan ID not found'
@@ -451,10 +721,45 @@ def get_scan_status(scan_id):
 
     return jsonify({
         'success': True,
-        'scan_status': scan_status[scan_id]
+        'scan_status': status
     })
 
 
+@app.route('/api/scan/stream/<scan_id>', methods=['GET'])
+def stream_scan_status(scan_id):
+    """Stream status changes of a scan operation as Server-Sent Events"""
+    with _SS_LOCK:
+        event = scan_events.get(scan_id)
+
+    if event is None:
+        return jsonify({
+            'success': False,
+            'error': 'Scan ID not found'
+        }), 404
+
+    def generate():
+        last_sent = None
+        while True:
+            # Clear before reading, so a change made after the snapshot
+            # wakes us up again
+            event.clear()
+            _check_scan_future(scan_id)
+            snapshot = _get_scan_status(scan_id)
+            if snapshot is None:
+                return
+
+            if snapshot != last_sent:
+                last_sent = snapshot
+                yield f"data: {app.json.dumps(snapshot)}\n\n"
+                if snapshot['status'] in ('completed', 'error'):
+                    return
+
+            if not event.wait(SCAN_STREAM_KEEPALIVE):
+                yield ": keepalive\n\n"
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
 @app.route('/api/download/<filename>')
 def download_scan(filename):
     """Download a scanned file"""
@@ -476,22 +781,27 @@ def download_scan(filename):
 
 @app.route('/api/scans', methods=['GET'])
 def list_scans():
-    """List all available scans"""
+    """List all available scans, newest first (optionally limited with ?limit=N)"""
     try:
-        scans = []
-        for filename in os.listdir(app.config['UPLOAD_FOLDER']):
-            if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                stat = os.stat(filepath)
-                scans.append({
-                    'filename': filename,
-                    'size': stat.st_size,
-                    'created': datetime.datetime.fromtimestamp(stat.st_ctime).isoformat(),  # FIXED: Use datetime.datetime
-                    'modified': datetime.datetime.fromtimestamp(stat.st_mtime).isoformat()   # FIXED: Use datetime.datetime
-                })
+        limit = request.args.get('limit', type=int)
+
+        # scandir answers is_file() from the directory entry and skips the path
+        # joins; DirEntry.stat() is still one stat call per file on POSIX
+        with os.scandir(app.config['UPLOAD_FOLDER']) as it:
+            entries = [(e.name, e.stat()) for e in it if e.is_file() and e.name.lower().endswith(_ALLOWED)]
 
         # Sort by creation time (newest first)
-        scans.sort(key=lambda x: x['created'], reverse=True)
+        if limit is not None and limit >= 0:
+            entries = heapq.nlargest(limit, entries, key=lambda x: x[1].st_ctime)
+        else:
+            entries.sort(key=lambda x: x[1].st_ctime, reverse=True)
+
+        scans = [{
+            'filename': name,
+            'size': stat.st_size,
+            'created': datetime.datetime.fromtimestamp(stat.st_ctime),  # FIXED: Use datetime.datetime
+            'modified': datetime.datetime.fromtimestamp(stat.st_mtime)   # FIXED: Use datetime.datetime
+        } for name, stat in entries]
 
         return jsonify({
             'success': True,
@@ -504,68 +814,127 @@ def list_scans():
         }), 500
 
 
-def perform_scan(scan_id, scanner_index, filepath):
-    """Perform the actual scan operation in background thread"""
+def _add_scan_status(scan_id, status):
+    """Track a new scan, evicting the least recently used ones past _SS_MAX"""
+    with _SS_LOCK:
+        scan_status[scan_id] = status
+        scan_status.move_to_end(scan_id)
+        scan_events[scan_id] = threading.Event()
+        while len(scan_status) > _SS_MAX:
+            old_id, _ = scan_status.popitem(last=False)
+            scan_events.pop(old_id, None)
+            scan_futures.pop(old_id, None)
+
+
+def _get_scan_status(scan_id):
+    """Return a copy of a scan's status, or None if it isn't (or is no longer) tracked"""
+    with _SS_LOCK:
+        status = scan_status.get(scan_id)
+        if status is None:
+            return None
+        scan_status.move_to_end(scan_id)
+        return dict(status)
+
+
+def _set_scan_status(scan_id, **fields):
+    """Update a scan's status and wake anyone streaming it"""
+    with _SS_LOCK:
+        status = scan_status.get(scan_id)
+        if status is None:
+            return
+        status.update(fields)
+        event = scan_events[scan_id]
+    event.set()
+
+
+def _check_scan_future(scan_id):
+    """Surface anything that escaped the worker's own error handling"""
+    future = scan_futures.get(scan_id)
+    if future is not None and future.done():
+        error = future.exception()
+        status = _get_scan_status(scan_id)
+        if error is not None and status is not None and status['status'] != 'error':
+            _set_scan_status(scan_id, status='error', error=str(error))
+        scan_futures.pop(scan_id, None)
+
+
+def perform_scan(scan_id, scanner_info, filepath):
+    """Perform the actual scan operation on the hardware pool"""
     try:
         # Update status to indicate scanning in progress
-        scan_status[scan_id]['status'] = 'scanning'
-        scan_status[scan_id]['progress'] = 25
+        _set_scan_status(scan_id, status='scanning', progress=25)
 
-        print(f"🖨️ Starting scan from scanner {scanner_index}: {available_scanners[scanner_index]['name']}")
+        logger.info(f"🖨️ Starting scan from scanner {scanner_info['device_id']}: {scanner_info['name']}")
 
         # Update progress
-        scan_status[scan_id]['progress'] = 50
+        _set_scan_status(scan_id, progress=50)
 
         # Perform the scan
-        result = sm.scan(scanner_index, filepath)
+        result = sm.scan(scanner_info['device_id'], filepath)
 
-        print(f"✅ Scan completed: {result}")
+        logger.info(f"✅ Scan completed: {result}")
 
         # Update status on completion
-        scan_status[scan_id]['status'] = 'completed'
-        scan_status[scan_id]['progress'] = 100
-        scan_status[scan_id]['filename'] = os.path.basename(result)
+        _set_scan_status(scan_id, status='completed', progress=100, filename=os.path.basename(result))
 
     except Exception as e:
-        print(f"❌ Scan failed: {e}")
-        scan_status[scan_id]['status'] = 'error'
-        scan_status[scan_id]['error'] = str(e)
+        logger.error(f"❌ Scan failed: {e}")
+        _set_scan_status(scan_id, status='error', error=str(e))
 
 
 def perform_network_scan(scan_id, escl_url, filepath):
-    """Perform the actual network scan operation in background thread"""
+    """Perform the actual network scan operation on the eSCL pool"""
     try:
         # Update status to indicate scanning in progress
-        scan_status[scan_id]['status'] = 'scanning'
-        scan_status[scan_id]['progress'] = 25
+        _set_scan_status(scan_id, status='scanning', progress=25)
 
-        print(f"🌐 Starting network scan from: {escl_url}")
+        logger.info(f"🌐 Starting network scan from: {escl_url}")
 
         # Update progress
-        scan_status[scan_id]['progress'] = 50
+        _set_scan_status(scan_id, progress=50)
 
         # Perform the network scan
         result = sm.scan_network_escl(escl_url, filepath)
 
-        print(f"✅ Network scan completed: {result}")
+        logger.info(f"✅ Network scan completed: {result}")
+
+        # Update status on completion
+        _set_scan_status(scan_id, status='completed', progress=100, filename=os.path.basename(result))
+
+    except Exception as e:
+        logger.error(f"❌ Network scan failed: {e}")
+        _set_scan_status(scan_id, status='error', error=str(e))
+
+
+async def perform_network_scan_async(scan_id, escl_url, filepath):
+    """Perform the network scan as a coroutine on the shared eSCL event loop"""
+    try:
+        # Update status to indicate scanning in progress
+        _set_scan_status(scan_id, status='scanning', progress=25)
+
+        logger.info(f"🌐 Starting network scan from: {escl_url}")
+
+        # Update progress
+        _set_scan_status(scan_id, progress=50)
+
+        # Perform the network scan
+        result = await sm.scan_network_escl_async(escl_session, escl_url, filepath)
+
+        logger.info(f"✅ Network scan completed: {result}")
 
         # Update status on completion
-        scan_status[scan_id]['status'] = 'completed'
-        scan_status[scan_id]['progress'] = 100
-        scan_status[scan_id]['filename'] = os.path.basename(result)
+        _set_scan_status(scan_id, status='completed', progress=100, filename=os.path.basename(result))
 
     except Exception as e:
-        print(f"❌ Network scan failed: {e}")
-        scan_status[scan_id]['status'] = 'error'
-        scan_status[scan_id]['error'] = str(e)
+        logger.error(f"❌ Network scan failed: {e}")
+        _set_scan_status(scan_id, status='error', error=str(e))
 
 
 if __name__ == '__main__':
-    import os
-    port = int(os.getenv("PORT", 5000))
-    if os.getenv("RENDER"):
-        print("Running on Render")
-        from gunicorn.app.wsgiapp import run
-        run()
+    # Other platforms were handed to gunicorn at the top of the module
+    if os.getenv("FLASK_DEV"):
+        app.run(debug=False, host='0.0.0.0', port=PORT, threaded=True)
     else:
-        app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
+        from waitress import serve
+        logger.info(f"Serving with waitress on port {PORT}")
+        serve(app, host='0.0.0.0', port=PORT, threads=WEB_THREADS)
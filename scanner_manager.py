@@ -1,39 +1,80 @@
+import logging
 import platform
 import os
-from backends import sane_backend, twain_backend
-from backends.escl_backend import scan_from_escl
+import threading
+import time
+from backends.escl_backend import scan_from_escl, stream_from_escl
+
+logger = logging.getLogger(__name__)
+
+# Resolved once at import; neither changes during the life of the process
+OS_NAME = platform.system().lower()
+IS_RENDER = os.getenv("RENDER") == "true"
+
 
 class ScannerManager:
     def __init__(self):
-        self.os = platform.system().lower()
-        self.is_render = os.getenv("RENDER") == "true"
-        self.is_render = os.getenv("RENDER") == "true"
+        self.os = OS_NAME
+        self.is_render = IS_RENDER
 
         if self.is_render:
-        self.is_render = os.getenv("RENDER") == "true"
-            print("Running on Render → using pure eSCL")
+            logger.info("Running on Render → using pure eSCL")
             self.backend = "escl"
         elif self.os in ["linux", "darwin"]:
             try:
+                from backends import sane_backend
                 self.backend = sane_backend.SaneBackend()
-                print("Using SANE backend")
+                logger.info("Using SANE backend")
             except Exception as e:
-                print(f"SANE failed ({e}), falling back to eSCL")
+                logger.warning(f"SANE failed ({e}), falling back to eSCL")
                 self.backend = "escl"
         elif self.os == "windows":
-            self.backend = twain_backend.TwainBackend()
+            try:
+                from backends import twain_backend
+                self.backend = twain_backend.TwainBackend()
+                logger.info("Using TWAIN backend")
+            except Exception as e:
+                logger.warning(f"TWAIN failed ({e}), falling back to eSCL")
+                self.backend = "escl"
         else:
             self.backend = "escl"
 
+        # Device enumeration is slow (BJNP broadcast, USB probes), so keep the
+        # last result around for a short while
+        self._cache = None  # (timestamp, scanners)
+        self._cache_ttl = 30.0
+        self._cache_lock = threading.Lock()
+
     def list_scanners(self):
         if self.backend == "escl":
             return []  # Auto-discover via frontend
-        return self.backend.list_scanners()
 
-    def scan(self, scanner_id, output_file="scan.png"):
+        with self._cache_lock:
+            if self._cache is not None:
+                ts, scanners = self._cache
+                if time.monotonic() - ts < self._cache_ttl:
+                    return scanners
+
+            scanners = self.backend.list_scanners()
+            self._cache = (time.monotonic(), scanners)
+            return scanners
+
+    def invalidate(self):
+        """Drop the cached scanner list so the next lookup re-probes devices"""
+        with self._cache_lock:
+            self._cache = None
+
+    def scan(self, device_id, output_file="scan.png"):
         if self.backend == "escl":
             raise RuntimeError("Use scan_network_escl() on Render")
-        return self.backend.scan(scanner_id, output_file)
+        return self.backend.scan(device_id, output_file)
 
     def scan_network_escl(self, url, output_file="scan.jpg"):
-        return scan_from_escl(url, output_file)
\ No newline at end of file
+        return scan_from_escl(url, output_file)
+
+    def stream_network_escl(self, url):
+        return stream_from_escl(url)
+
+    async def scan_network_escl_async(self, session, url, output_file="scan.jpg"):
+        from backends.escl_backend_async import scan_from_escl_async
+        return await scan_from_escl_async(session, url, output_file)
\ No newline at end of file
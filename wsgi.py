@@ -0,0 +1,2 @@
+# WSGI entry point, e.g. gunicorn -w 1 --threads 16 -b 0.0.0.0:5000 wsgi:app
+from main import app